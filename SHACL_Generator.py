@@ -1,56 +1,536 @@
 import tkinter as tk
-from tkinter import scrolledtext, messagebox, simpledialog
-from openai import OpenAI
+from tkinter import scrolledtext, messagebox, simpledialog, ttk
 import re
 import logging
-from pyshacl import validate
-from rdflib import Graph
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import time
+import random
+import json
+import hashlib
+import argparse
+import atexit
+import functools
+import msgpack
+from pathlib import Path
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-class OpenAIClient:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
-        self.history = [{"role": "system", "content": "You are an assistant responding to queries about Schema.org concepts."}]
+# Patterns used to clean up generated Turtle documents
+_NON_TURTLE_RE = re.compile(r'[^@;\w\s:\[\]\{\}\(\)\<\>=\.\-\"\/]+')
+_BLANK_LINE_RE = re.compile(r'\n\s*\n')
+_MD_FENCE_RE = re.compile(r'```(?:turtle|ttl)?\s*')
+_PREFIX_DOT_RE = re.compile(r'@prefix\s*.*?\s*(?<!.)\n')
+_HAS_PREFIX_RE = re.compile(r'@prefix', re.IGNORECASE)
+
+_USE_CASE_SEPARATOR_RE = re.compile(r'^\s*-{3,}\s*$', re.MULTILINE)  # Separates use cases in Batch Mode
+
+API_KEY = "XXXX-XXXX-XXXX-XXXX"  # Replace with your OpenAI API key
+
+# Conversation history and response cache are kept across sessions
+STATE_PATH = Path.home() / ".shacl_gen" / "state.msgpack"
+CACHE_TTL = 7 * 24 * 60 * 60  # Seconds a cached response is kept
+
+class CapacityBucket:
+    """Leaky bucket that refills continuously up to a per-minute capacity."""
+    def __init__(self, capacity_per_minute: float):
+        self.capacity = capacity_per_minute
+        self.available_capacity = capacity_per_minute
+        self.last_update = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_update
+        self.available_capacity = min(self.capacity, self.available_capacity + elapsed * self.capacity / 60)
+        self.last_update = now
+
+    async def acquire(self, amount: float = 1):
+        """Wait until the requested capacity is available and consume it."""
+        amount = min(amount, self.capacity)  # A single oversized request must not wait forever
+        async with self.lock:
+            while True:
+                self._refill()
+                if self.available_capacity >= amount:
+                    self.available_capacity -= amount
+                    return
+                await asyncio.sleep((amount - self.available_capacity) * 60 / self.capacity)
 
-    def ask(self, prompt: str, model: str = "gpt-4o", max_retries=3) -> str:
-        """Send a query to OpenAI API and retrieve the response with retry mechanism."""
+class OpenAIClient:
+    def __init__(self, api_key: str, max_concurrency: int = 10, max_requests_per_minute: float = 500, max_tokens_per_minute: float = 30000, state_path=STATE_PATH):
+        import httpx  # Imported on first use to keep startup fast
+        from openai import AsyncOpenAI
+        # One pooled HTTP/2 client for all requests, so later steps reuse the warm TLS connection.
+        # Non-streamed completions only respond once fully generated, so they get a long read timeout.
+        http_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60),
+            timeout=httpx.Timeout(600.0, connect=5.0)
+        )
+        # Retries are handled in _create() so that every attempt goes through the rate limiter
+        self.client = AsyncOpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+        self.semaphore = asyncio.Semaphore(max_concurrency)  # Cap the number of requests in flight
+        self.rpm_bucket = CapacityBucket(max_requests_per_minute)
+        self.tpm_bucket = CapacityBucket(max_tokens_per_minute)
+        self.history = [{"role": "system", "content": SYSTEM_PROMPT}]
+        self._conversation = None  # Key of the use case the history belongs to
+        self._histories: dict[str, list] = {}  # [messages, timestamp] of the saved conversation about each use case
+        self._cache: dict[str, list] = {}  # [response, timestamp] of deterministic (temperature 0) requests
+        self.state_path = state_path
+        if self.state_path is not None:
+            self._load()
+            atexit.register(self._save)
+
+    def _load(self):
+        """Restore the unexpired conversations and cache entries saved by an earlier session."""
+        if not self.state_path.exists():
+            return
+        try:
+            state = msgpack.unpackb(self.state_path.read_bytes())
+        except Exception as e:
+            logger.warning(f"Could not load saved state from {self.state_path}: {e}")
+            return
+        now = time.time()
+        self._histories = {key: entry for key, entry in state.get("histories", {}).items() if now - entry[1] < CACHE_TTL}
+        self._cache = {key: entry for key, entry in state.get("cache", {}).items() if now - entry[1] < CACHE_TTL}
+
+    def _save(self):
+        """Write the conversations and the response cache to disk."""
+        self._store_conversation()
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            self.state_path.write_bytes(msgpack.packb({"histories": self._histories, "cache": self._cache}))
+        except OSError as e:
+            logger.warning(f"Could not save state to {self.state_path}: {e}")
+
+    def start_conversation(self, use_case: str):
+        """Switch the history to the conversation about the use case, restoring it if it was saved earlier."""
+        key = hashlib.sha256(use_case.encode("utf-8")).hexdigest()
+        if key == self._conversation:
+            return
+        self._store_conversation()
+        self._conversation = key
+        # The system message is never restored, so a revised SYSTEM_PROMPT always takes effect
+        saved = self._histories.get(key)
+        self.history = [{"role": "system", "content": SYSTEM_PROMPT}] + (saved[0] if saved else [])
+
+    def _store_conversation(self):
+        """Keep the current conversation so it can be restored for its use case."""
+        if self._conversation is not None and len(self.history) > 1:
+            self._histories[self._conversation] = [self.history[1:], time.time()]
+
+    async def aclose(self):
+        """Close the pooled HTTP connections."""
+        await self.client.close()
+
+    async def __aenter__(self):
+        """Use the client as an async context manager that closes it on exit."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the client when leaving the context."""
+        await self.aclose()
+
+    def _cache_key(self, model, messages, temperature, json_mode, max_tokens):
+        """Hash a request into a cache key that changes whenever the prompts are revised."""
+        request = json.dumps({"model": model, "messages": messages, "t": temperature, "json": json_mode, "max_tokens": max_tokens}, sort_keys=True)
+        return f"{PROMPT_VERSION}:{hashlib.sha256(request.encode('utf-8')).hexdigest()}"
+
+    def _messages(self, prompt, stateless, context=()):
+        """Build the messages for a request, recording the context and prompt in the history unless stateless."""
+        user_message = {"role": "user", "content": prompt}
+        if stateless:
+            return [self.history[0], *context, user_message]
+        self.history.extend(context)
+        self.history.append(user_message)
+        # Never trim away the context that was just added for this prompt
+        self.trim_history(keep=len(context) + 1)
+        return self.history
+
+    def trim_history(self, max_tokens: int = 8000, keep: int = 1):
+        """Drop the oldest exchanges until the history fits into max_tokens, keeping the system message and the last keep messages."""
+        while len(self.history) > keep + 2 and count_tokens(self.history) > max_tokens:
+            del self.history[1:3]
+
+    async def ask(self, prompt: str, model: str = "gpt-4o", max_retries=3, temperature: float = 0.7, json_mode: bool = False, stateless: bool = False, max_tokens: int = 1500, context=()) -> str:
+        """Send a query to OpenAI API and retrieve the response with retry mechanism.
+
+        With json_mode the model is constrained to answer with a JSON object. Stateless queries are
+        sent with the system message only and are not recorded in the conversation history. Context
+        messages are sent right before the prompt and are not trimmed from the history for this request.
+        """
+        messages = self._messages(prompt, stateless, context)
+
+        # Only deterministic requests are answered from the cache
+        cache_key = self._cache_key(model, messages, temperature, json_mode, max_tokens) if temperature == 0 else None
+        if cache_key in self._cache:
+            logger.debug("Answering request from the response cache")
+            ai_response = self._cache[cache_key][0]
+        else:
+            kwargs = {"response_format": {"type": "json_object"}} if json_mode else {}
+            response = await self._create(model, messages, temperature, max_tokens, max_retries, **kwargs)
+            ai_response = response.choices[0].message.content
+            finish_reason = response.choices[0].finish_reason
+            if finish_reason == "length":
+                logger.warning(f"Response was truncated at the max_tokens limit of {max_tokens}")
+            # Only complete responses are cached; truncated or invalid JSON would be replayed for the whole TTL
+            if cache_key is not None and finish_reason == "stop" and (not json_mode or self._is_json(ai_response)):
+                self._cache[cache_key] = [ai_response, time.time()]
+        if not stateless:
+            self.history.append({"role": "assistant", "content": ai_response})
+        return ai_response
+
+    @staticmethod
+    def _is_json(text: str) -> bool:
+        """Check whether the text is a valid JSON document."""
+        try:
+            json.loads(text)
+        except (TypeError, ValueError):
+            return False
+        return True
+
+    async def astream(self, prompt: str, model: str = "gpt-4o", max_retries=3, temperature: float = 0.7, stateless: bool = False, max_tokens: int = 1500):
+        """Send a query to OpenAI API and yield the response in chunks as they arrive."""
+        import httpx
+        messages = self._messages(prompt, stateless)
+        # Chunks arrive continuously, so a stalled stream is detected with a short read timeout
+        stream = await self._create(model, messages, temperature, max_tokens, max_retries, stream=True,
+                                    timeout=httpx.Timeout(60.0, connect=5.0))
+        chunks = []
+        async for chunk in stream:
+            content = (chunk.choices[0].delta.content or "") if chunk.choices else ""
+            chunks.append(content)
+            yield content
+        if not stateless:
+            self.history.append({"role": "assistant", "content": "".join(chunks)})
+
+    async def _create(self, model, messages, temperature, max_tokens, max_retries, **kwargs):
+        """Send a chat completion request within the rate limits, retrying transient errors with exponential backoff."""
+        from openai import APIConnectionError, InternalServerError, RateLimitError
         for attempt in range(max_retries):
             try:
-                self.history.append({"role": "user", "content": prompt})
-                response = self.client.chat.completions.create(
-                    model=model,
-                    messages=self.history,
-                    temperature=0.7,
-                    max_tokens=1500
-                )
-                ai_response = response.choices[0].message.content
-                self.history.append({"role": "assistant", "content": ai_response})
-                return ai_response
-            except Exception as e:
+                # Reserve request and token capacity (prompt plus the completion budget) before sending
+                await self.rpm_bucket.acquire(1)
+                await self.tpm_bucket.acquire(count_tokens(messages) + max_tokens)
+                async with self.semaphore:
+                    return await self.client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **kwargs
+                    )
+            except (RateLimitError, InternalServerError, APIConnectionError) as e:  # APIConnectionError includes timeouts
                 if attempt < max_retries - 1:
-                    logger.info(f"Attempt {attempt + 1} failed. Retrying in 5 seconds...")
-                    time.sleep(5)  # Wait before retrying
+                    delay = min(60, 2 ** attempt) + random.random()  # Exponential backoff with jitter
+                    logger.info(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f} seconds...")
+                    await asyncio.sleep(delay)  # Wait before retrying
                 else:
                     raise Exception(f"Error communicating with OpenAI API after {max_retries} attempts: {e}")
 
-def validate_shacl(shacl_doc):
-    """Validate SHACL document with some pre-processing for cleanliness."""
-    # Clean the SHACL document
-    shacl_doc = re.sub(r'[^@;\w\s:\[\]\{\}\(\)\<\>=\.\-\"\/]+', '', shacl_doc)  # Remove non-Turtle syntax characters
-    shacl_doc = re.sub(r'\n\s*\n', '\n', shacl_doc)  # Remove extra newlines
-    shacl_doc = re.sub(r'```(turtle|ttl)?\s*', '', shacl_doc)  # Remove markdown formatting
-    shacl_doc = re.sub(r'```\s*', '', shacl_doc)
-    shacl_doc = shacl_doc.strip()  # Remove leading/trailing whitespace
+    async def submit_batch(self, prompts, model: str = "gpt-4o", temperature: float = 0.7, json_mode: bool = False, max_tokens: int = 1500) -> list:
+        """Send the prompts through the OpenAI Batch API and return the responses in prompt order.
+
+        Requests that failed or are missing from the output are logged and returned as None.
+        """
+        if not prompts:
+            return []
+        requests = [{
+            "custom_id": f"req-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [self.history[0], {"role": "user", "content": prompt}],
+                "temperature": temperature,
+                "max_tokens": max_tokens,
+                **({"response_format": {"type": "json_object"}} if json_mode else {})
+            }
+        } for i, prompt in enumerate(prompts)]
+        batch_input = "\n".join(json.dumps(request) for request in requests).encode("utf-8")
+
+        batch_file = await self.client.files.create(file=("batch.jsonl", batch_input), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(prompts)} requests")
+
+        # Poll with exponential backoff until the batch reaches a final state
+        delay = 5
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(delay)
+            delay = min(300, delay * 2)
+            batch = await self.client.batches.retrieve(batch.id)
+            logger.debug(f"Batch {batch.id} status: {batch.status}")
+        if batch.status != "completed" or batch.output_file_id is None:
+            raise Exception(f"Batch {batch.id} finished with status '{batch.status}'")
+
+        output = await self.client.files.content(batch.output_file_id)
+        responses = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            if result.get("error") or result["response"]["status_code"] != 200:
+                logger.error(f"Batch request {result['custom_id']} failed: {result.get('error') or result['response']['body']}")
+                continue
+            responses[result["custom_id"]] = result["response"]["body"]["choices"][0]["message"]["content"]
+        if len(responses) < len(prompts):
+            logger.error(f"Batch {batch.id} returned {len(responses)} of {len(prompts)} responses")
+        return [responses.get(f"req-{i}") for i in range(len(prompts))]
+
+PROMPT_VERSION = 2  # Bump whenever a prompt prefix changes so cached responses are invalidated
+
+# Completion budgets per step: short entity lists, per-entity property lists and full SHACL documents
+STEP_1_MAX_TOKENS = 1000
+STEP_2_MAX_TOKENS = 1200
+STEP_3_MAX_TOKENS = 2500
+MAX_OUTPUT_TOKENS = 16384  # Completion limit of gpt-4o
+
+SYSTEM_PROMPT = "You are an assistant responding to queries about Schema.org concepts."
+
+# Static prompt instructions. Only the varying data is appended after them, so repeated
+# requests share an identical prefix that the API can serve from its prompt cache.
+PROMPT_1_PREFIX = """I will provide you with a text describing a use case. I would like you to extract all objects from this text that match Turtle Code from this source: https://schema.org/version/latest/schemaorg-current-https.ttl. 
+        It is important that you always contextually select only the most logical and fitting example from the provided source. The output should only include the noun used in the source, meaning not the name but the overarching concept for names, such as "I" would be "Person", as well as the exact description provided under rdfs:comment of the according selection in the provided source.
+
+Here is an example:
+The Use Case is "I have the company Amazon which has 50 employees. These employees should own BMWs. These cars must in turn be manufactured by company AB."
+
+A correct output for this would be:
+Car (Fits for BMW)
+A car is a wheeled, self-powered motor vehicle used for transportation.
+Organization (Fits for Amazon)
+An organization such as a school, NGO, corporation, club, etc.
+Person (Fits for Employees and I)
+A person (alive, dead, undead, or fictional).
+
+Note, that Car is chosen over Vehicle, as it is the most fitting and accurate. Vehicle would be incorrect, but not accurate enough. Always choose the most accurate example.
+
+Another example might be as such:
+The Use Case is "I have a friend who like to fly with a plane, but it costs about 5.000€ to do so. Luckily, he just found a Joboffer which will pay him handsomely. He can also renovate his house!"
+A correct output for this would be:
+Person  (Fits for I and Friend)
+A person (alive, dead, undead, or fictional).
+Aircraft  (Fits for Plane)
+An aircraft is a vehicle capable of atmospheric flight due to interaction with the air, such as buoyancy or lift.
+JobPosting  (Fits for Joboffer)
+A listing that describes a job opening in a certain organization.
+House  (Fits for House)
+A house is a building or structure that serves as living quarters for one or more families.
+MonetaryAmount  (Fits for 5.000€)
+A monetary value or range. This type can be used to describe an amount of money such as $50 USD.
+
+Make sure your answers are consistent with your findings and name them as such. A Mercedes is a Car, not an Automotive, as Automotive doesnt exist in the provided list, but Car does and is the most fitting match.
+If nouns occur multiple times, e.g., two different companies, do not provide redundant results but only one for "Organization".
+Your answer should only include the types and descriptions as provided in the example. The "(Fits for ...)" notes in the examples only explain the choice and are not part of the type.
+
+Double check and work cronologically through all mentioned steps before providing your answer. Make once again sure to check if any more fitting descriptions are available, e.g. instead of "Place" for Europe, "Continent" would be more accurate. 
+
+Please double check your information. Is everything included? Is everything reflected appropiately and correctly within your provided answer? Make sure to remove redundancies in your answer. 
+Also make sure that all answeres are also pulled from the provided source: https://schema.org/version/latest/schemaorg-current-https.ttl. Your answer should only contain the JSON object and no further comments of yourself.
+Return a JSON object {"entities": [{"type": "Person", "description": "A person (alive, dead, undead, or fictional)."}]} with one item per type."""
+
+PROMPT_2_PREFIX = """Please take the properties and expected types for the entity given below from the provided Use Case and the Type you selected in combination with Schema.org, without actually fetching the URLs. Format the output similarly to the Schema.org page for this entity.
+
+A Use Case could be "I have the company Amazon which has 50 employees, out of which one is my Friend Peter Müller, aged 27. These employees should own red BMWs." and a result provided by you created from this Use Case could be as follows:
+Type: Person
+Description: A person (alive, dead, undead, or fictional).
+
+An example format for a correct answer would be:
+
+{"properties": [
+    {"name": "familyName", "description": "Family name. In the U.S., the last name of a Person.", "expected_type": "Text"},
+    {"name": "givenName", "description": "Given name. In the U.S., the first name of a Person.", "expected_type": "Text"},
+    {"name": "birthDate", "description": "Date of birth.", "expected_type": "Date"},
+    {"name": "affiliation", "description": "An organization that this person is affiliated with.", "expected_type": "Organization"},
+    {"name": "owns", "description": "Products owned by the organization or person.", "expected_type": "Product"}
+]}
+
+As you can see, only properties which can be logically concluded from the use case are used. Once again, you have to abstract the description in the use case to the most logical property you can find on the according Schema-site for the Type.
+You canot use a property for X, if you didnt find it for X on Schema.org. Do not cross-use different properties if they are not findable for that specific type.
+If no properties or descriptions are provided within the Use Case, you can assume the most basic properties the specific Type could need, e.g. a Name or ID or anything which allows for a unique identification of the type.
+Your answer should only contain the JSON object with the properties and no further comments of yourself."""
+
+PROMPT_3_PREFIX = """Please generate a SHACL document that meets the following requirements:
+
+- Include all types and their properties as described below.
+- Use all necessary prefix declarations based on the types and properties included in the results. This could include prefixes for Schema.org, SHACL, XSD, and possibly others.
+- The SHACL shapes should combine NodeShapes and PropertyShapes, similar to this example:
+
+```turtle
+ex:ExampleNodeShapeWithPropertyShapes
+    a sh:NodeShape ;
+    sh:targetClass ex:ExampleClass ;
+    sh:property [
+        sh:path ex:email ;
+        sh:name "e-mail" ;
+        sh:description "We need at least one email value" ;
+        sh:datatype xsd:string ;
+        sh:minCount 1 ;
+        sh:maxCount 1 ;
+    ] ;
+    sh:property [
+        sh:path ex:address ;
+        sh:name "Address" ;
+        sh:description "Physical address of the item" ;
+        sh:class ex:PostalAddress ;
+        sh:minCount 1 ;
+        sh:maxCount 1 ;
+    ] .
+```
+
+Please analyze this SHACL document and make corrections where necessary. Ensure the following:
+
+- All prefixes are correctly declared and used.
+- The structure and syntax of NodeShapes and PropertyShapes are valid.
+- Datatypes and expected classes align with Schema.org definitions.
+- Add comments or explanations for corrections made.
+
+Provide the corrected SHACL document in Turtle syntax."""
+
+# The static prompt parts are tokenized once; requests only encode the text appended to them
+@functools.cache
+def _encoder():
+    """Return the gpt-4o tokenizer and the token counts of the prompt prefixes, loaded on first use."""
+    import tiktoken  # Imported on first use, as loading the encoding may download it
+    enc = tiktoken.encoding_for_model("gpt-4o")
+    prefix_tokens = {prefix: len(enc.encode(prefix))
+                     for prefix in (SYSTEM_PROMPT, PROMPT_1_PREFIX, PROMPT_2_PREFIX, PROMPT_3_PREFIX)}
+    return enc, prefix_tokens
+
+def count_tokens(messages):
+    """Count the prompt tokens of a list of chat messages."""
+    enc, prefix_token_counts = _encoder()
+    total = 0
+    for message in messages:
+        text = message["content"]
+        for prefix, prefix_tokens in prefix_token_counts.items():
+            if text.startswith(prefix):
+                total += prefix_tokens + len(enc.encode(text[len(prefix):]))
+                break
+        else:
+            total += len(enc.encode(text))
+    return total
+
+def build_use_case_prompt(use_case):
+    """Build the entity extraction prompt for a use case."""
+    return PROMPT_1_PREFIX + "\n\nHere is the text to analyze:\n" + use_case
+
+def build_use_cases_prompt(use_cases):
+    """Build a single entity extraction prompt covering several use cases."""
+    numbered_use_cases = "\n\n".join(f"[{i}] {use_case}" for i, use_case in enumerate(use_cases, start=1))
+    return PROMPT_1_PREFIX + f"""
+
+For each of the following {len(use_cases)} use cases, perform the extraction described above independently.
+Instead of a single entities object, return a JSON object {{"results": [...]}} where item i of the array is the entities object for use case i.
+Use cases:
+""" + numbered_use_cases
+
+def build_entity_prompt(use_case, entity):
+    """Build the property extraction prompt for a single extracted entity of a use case."""
+    return PROMPT_2_PREFIX + f"\n\nHere is the Use Case:\n{use_case}\n\nHere is my result:\nType: {entity['type']}\nDescription: {entity['description']}"
+
+def build_properties_context_prompt(use_case, entities):
+    """Build a single property extraction prompt covering all extracted entities of a use case."""
+    types = "\n\n".join(f"Type: {entity['type']}\nDescription: {entity['description']}" for entity in entities)
+    return (PROMPT_2_PREFIX + f"\n\nHere is the Use Case:\n{use_case}\n\nHere is my result:\n{types}\n\n"
+            "Do this for every type above and answer with one JSON object that lists all of them in the format "
+            '{"types": [{"type": "...", "description": "...", "properties": [...]}]}, '
+            "where each properties list is formatted as in the example.")
+
+def build_shacl_prompt(types_and_properties):
+    """Build the SHACL generation prompt from the extracted types and properties."""
+    return PROMPT_3_PREFIX + "\n\nHere are the types and their properties:\n" + types_and_properties
+
+def parse_entities(text):
+    """Return the entity objects of a JSON entity extraction response."""
+    return json.loads(text)["entities"]
+
+def format_entities(entities):
+    """Render an entity list as the JSON entity extraction shown in the GUI."""
+    return json.dumps({"entities": entities}, indent=2, ensure_ascii=False)
+
+def format_properties(entities, responses):
+    """Assemble the per-entity JSON property responses into one JSON listing of all types."""
+    return json.dumps({"types": [
+        {"type": entity["type"], "description": entity["description"], "properties": json.loads(response)["properties"]}
+        for entity, response in zip(entities, responses)
+    ]}, indent=2, ensure_ascii=False)
+
+def extract_shacl_code(text):
+    """Extract the SHACL code block from the AI-generated text."""
+    # Use regex to find the SHACL code block (assuming it's enclosed in ```turtle or ```)
+    shacl_pattern = r"```(?:turtle)?\s*(.*?)```"
+    match = re.search(shacl_pattern, text, re.DOTALL)
+    if match:
+        return match.group(1).strip()  # Return the extracted SHACL code
+    else:
+        # If no code block is found, assume the entire text is SHACL code
+        return text.strip()
+
+async def run_batch(client, use_cases):
+    """Run all three steps for several use cases through the Batch API and return one SHACL document per use case.
+
+    A use case whose responses are missing or cannot be parsed is logged and skipped; its entry is None.
+    """
+    # Step 1: Extract entities
+    responses_1 = await client.submit_batch([build_use_case_prompt(use_case) for use_case in use_cases],
+                                            temperature=0, json_mode=True, max_tokens=STEP_1_MAX_TOKENS)
+
+    # Step 2: Extract properties, one request per entity of every use case
+    prompts_2 = {}  # Use case index -> (entities, per-entity prompts)
+    for i, response_1 in enumerate(responses_1):
+        try:
+            case_entities = parse_entities(response_1)
+            prompts_2[i] = (case_entities, [build_entity_prompt(use_cases[i], entity) for entity in case_entities])
+        except (TypeError, ValueError, KeyError) as e:
+            logger.error(f"Skipping use case {i + 1}: the entity extraction could not be parsed: {e}")
+    responses_2 = iter(await client.submit_batch([prompt for _, case_prompts in prompts_2.values() for prompt in case_prompts],
+                                                 temperature=0, json_mode=True, max_tokens=STEP_2_MAX_TOKENS))
+    formatted_responses_2 = {}
+    for i, (case_entities, case_prompts) in prompts_2.items():
+        case_responses = [next(responses_2) for _ in case_prompts]
+        try:
+            formatted_responses_2[i] = format_properties(case_entities, case_responses)
+        except (TypeError, ValueError, KeyError) as e:
+            logger.error(f"Skipping use case {i + 1}: the property extraction could not be parsed: {e}")
+
+    # Step 3: Generate SHACL documents
+    responses_3 = await client.submit_batch([build_shacl_prompt(response_2) for response_2 in formatted_responses_2.values()],
+                                            max_tokens=STEP_3_MAX_TOKENS)
+    shacl_docs = [None] * len(use_cases)
+    for i, response_3 in zip(formatted_responses_2, responses_3):
+        if response_3 is None:
+            logger.error(f"Skipping use case {i + 1}: no SHACL document was generated")
+        else:
+            shacl_docs[i] = extract_shacl_code(response_3)
+    return shacl_docs
+
+def _clean_turtle(doc: str) -> str:
+    """Strip non-Turtle characters and markdown formatting from a SHACL document."""
+    doc = _NON_TURTLE_RE.sub('', doc)  # Remove non-Turtle syntax characters
+    doc = _BLANK_LINE_RE.sub('\n', doc)  # Remove extra newlines
+    doc = _MD_FENCE_RE.sub('', doc)  # Remove markdown formatting
+    doc = doc.strip()  # Remove leading/trailing whitespace
 
     # Ensure each @prefix declaration ends with a dot
-    shacl_doc = re.sub(r'@prefix\s*.*?\s*(?<!.)\n', r'\g<0>.\n', shacl_doc)
+    return _PREFIX_DOT_RE.sub(r'\g<0>.\n', doc)
+
+def validate_shacl(shacl_doc, inference='rdfs'):
+    """Validate SHACL document with some pre-processing for cleanliness.
+
+    Pass inference=None for a faster check without RDFS inference.
+    """
+    shacl_doc = _clean_turtle(shacl_doc)
 
     # Add basic prefixes if none are present
-    if not re.search(r'@prefix', shacl_doc, re.IGNORECASE):
+    if not _HAS_PREFIX_RE.search(shacl_doc):
         shacl_doc = """@prefix ex: <http://example.org/> .
 @prefix sh: <http://www.w3.org/ns/shacl#> .
 @prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
@@ -60,29 +540,48 @@ def validate_shacl(shacl_doc):
 
 """ + shacl_doc
 
+    from pyshacl import validate  # Imported on first use to keep startup fast
+    from rdflib import Graph
     try:
         g = Graph()
         g.parse(data=shacl_doc, format="turtle")
-        conforms, _, results_text = validate(data_graph=g, shacl_graph=None, inference='rdfs')
+        conforms, _, results_text = validate(data_graph=g, shacl_graph=None, inference=inference)
         return conforms, results_text
     except Exception as e:
         logger.error(f"Error during SHACL validation: {e}")
         return False, str(e)
 
+def check_turtle_syntax(shacl_doc):
+    """Check that a generated SHACL document parses as Turtle, without any pre-processing."""
+    from rdflib import Graph  # Imported on first use to keep startup fast
+    try:
+        g = Graph()
+        g.parse(data=shacl_doc, format="turtle")
+        return True, f"Parsed {len(g)} triples."
+    except Exception as e:
+        logger.error(f"Error while parsing the SHACL document: {e}")
+        return False, str(e)
+
+# Templates for the basic SHACL document generated when auto-correction fails
+_BASE_SHACL_HEADER = "@prefix ex: <http://example.org/> .\n@prefix sh: <http://www.w3.org/ns/shacl#> .\n@prefix schema: <https://schema.org/> .\n@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .\n\n"
+_NODE_SHAPE_TMPL = """ex:{class_name}
+    a sh:NodeShape ;
+    sh:targetClass schema:{class_name} ;
+"""
+_PROP_TMPL = """    sh:property [
+        sh:path schema:{path} ;
+        sh:datatype xsd:string ;
+        sh:minCount 1 ;
+        sh:maxCount 1 ;
+    ] ;
+"""
+
 def auto_correct_shacl(shacl_doc, classes_and_properties):
     """Automatically correct and integrate SHACL issues based on classes and properties."""
-    # Clean the SHACL document
-    shacl_doc = re.sub(r'[^@;\w\s:\[\]\{\}\(\)\<\>=\.\-\"\/]+', '', shacl_doc)  # Remove non-Turtle syntax characters
-    shacl_doc = re.sub(r'\n\s*\n', '\n', shacl_doc)  # Remove extra newlines
-    shacl_doc = re.sub(r'```(turtle|ttl)?\s*', '', shacl_doc)  # Remove markdown formatting
-    shacl_doc = re.sub(r'```\s*', '', shacl_doc)
-    shacl_doc = shacl_doc.strip()  # Remove leading/trailing whitespace
-
-    # Ensure each @prefix declaration ends with a dot
-    shacl_doc = re.sub(r'@prefix\s*.*?\s*(?<!.)\n', r'\g<0>.\n', shacl_doc)
+    shacl_doc = _clean_turtle(shacl_doc)
 
     # Add basic prefixes if none are present
-    if not re.search(r'@prefix', shacl_doc, re.IGNORECASE):
+    if not _HAS_PREFIX_RE.search(shacl_doc):
         shacl_doc = """@prefix ex: <http://example.org/> .
 @prefix sh: <http://www.w3.org/ns/shacl#> .
 @prefix schema: <https://schema.org/> .
@@ -90,6 +589,7 @@ def auto_correct_shacl(shacl_doc, classes_and_properties):
 
 """ + shacl_doc
 
+    from rdflib import Graph  # Imported on first use to keep startup fast
     try:
         g = Graph()
         g.parse(data=shacl_doc, format="turtle")
@@ -97,34 +597,89 @@ def auto_correct_shacl(shacl_doc, classes_and_properties):
     except Exception as e:
         logger.error(f"Error during SHACL auto-correction: {e}")
         # If parsing fails, generate a basic SHACL document
-        base_shacl = "@prefix ex: <http://example.org/> .\n@prefix sh: <http://www.w3.org/ns/shacl#> .\n@prefix schema: <https://schema.org/> .\n@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .\n\n"
+        parts = [_BASE_SHACL_HEADER]
         for class_name, properties in classes_and_properties.items():
-            base_shacl += f"""ex:{class_name}
-    a sh:NodeShape ;
-    sh:targetClass schema:{class_name} ;
-"""
-            for prop in properties:
-                base_shacl += f"""    sh:property [
-        sh:path schema:{prop['path']} ;
-        sh:datatype xsd:string ;
-        sh:minCount 1 ;
-        sh:maxCount 1 ;
-    ] ;
-"""
-        base_shacl += "."
-        return base_shacl
+            parts.append(_NODE_SHAPE_TMPL.format(class_name=class_name))
+            parts.extend(_PROP_TMPL.format(**prop) for prop in properties)
+        parts.append(".")
+        return "".join(parts)
 
 class Application(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("SHACL Generator")
         self.geometry("800x600")
-        self.api_key = "XXXX-XXXX-XXXX-XXXX"  # Replace with your OpenAI API key
+        self.api_key = API_KEY
         self.client = OpenAIClient(self.api_key)
+        # Run API calls on a background event loop so the GUI stays responsive
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        # Parse and validate SHACL documents off the Tk thread
+        self._pool = ThreadPoolExecutor(max_workers=2)
         self.use_case = "Enter your knowledge base information here..."
         self.current_step = 1  # Track the current step (1: Extract entities, 2: Extract properties, 3: Generate SHACL)
         self.create_main_interface()
 
+    def run_async(self, coro, callback):
+        """Run a coroutine on the background loop and pass its result to callback on the Tk thread.
+
+        The action buttons stay disabled until the result has been delivered.
+        """
+        self._set_busy(True)
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        future.add_done_callback(lambda f: self.after(0, self._deliver_result, f, callback, True))
+
+    def _set_busy(self, busy):
+        """Disable or re-enable every action button while a request is in flight; Cancel and Close stay usable."""
+        self.config(cursor="watch" if busy else "")
+        widgets = self.winfo_children()
+        while widgets:
+            widget = widgets.pop()
+            widgets.extend(widget.winfo_children())
+            if isinstance(widget, tk.Button) and widget.cget("text") not in ("Cancel", "Close"):
+                widget.config(state=tk.DISABLED if busy else tk.NORMAL)
+
+    def _deliver_result(self, future, callback, busy=False):
+        """Hand the result of a finished background call to its callback, or report the error."""
+        if busy:
+            self._set_busy(False)
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Background request failed: {e}")
+            messagebox.showerror("Error", str(e))
+            return
+        callback(result)
+
+    def destroy(self):
+        """Close the API client and stop the background event loop before closing the window."""
+        try:
+            asyncio.run_coroutine_threadsafe(self.client.aclose(), self.loop).result(timeout=2)
+        except Exception as e:
+            logger.warning(f"Could not close the API client: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
+
+    def validate_result(self, shacl_code):
+        """Check the Turtle syntax of a SHACL document in the thread pool and show the outcome below the result."""
+        validation_label = self.validation_label
+        validation_label.config(text="Checking Turtle syntax...", fg="black")
+        future = self._pool.submit(check_turtle_syntax, shacl_code)
+        future.add_done_callback(lambda f: self.after(0, self._deliver_result, f,
+                                                      lambda result: self._on_validated(validation_label, result)))
+
+    def _on_validated(self, validation_label, result):
+        """Show the syntax check outcome unless the result window has been closed in the meantime."""
+        parses, details = result
+        logger.debug(f"Turtle syntax check result: {details}")
+        if not validation_label.winfo_exists():
+            return
+        if parses:
+            validation_label.config(text="The SHACL document is valid Turtle.", fg="green")
+        else:
+            validation_label.config(text=f"Turtle syntax error: {details.strip()[:300]}", fg="red")
+
     def create_main_interface(self):
         """Create the main interface with a use_case input and buttons."""
         self.clear_window()
@@ -138,13 +693,42 @@ class Application(tk.Tk):
         # Buttons
         tk.Button(self, text="Cancel", command=self.destroy).pack(side=tk.LEFT, padx=20, pady=20)
         tk.Button(self, text="Next", command=self.process_use_case).pack(side=tk.RIGHT, padx=20, pady=20)
+        tk.Button(self, text="Batch Mode", command=self.process_use_cases_batch).pack(side=tk.RIGHT, padx=20, pady=20)
 
-    def create_result_interface(self, result, prompt):
-        """Create the result interface to display the generated response."""
+    def create_batch_result_interface(self, use_cases, extractions):
+        """Create one result tab per use case processed in Batch Mode."""
+        self.clear_window()
+
+        tk.Label(self, text="Output:").pack(pady=10)
+        notebook = ttk.Notebook(self)
+        notebook.pack(pady=10, fill=tk.BOTH, expand=True)
+        for i, (use_case, extraction) in enumerate(zip(use_cases, extractions), start=1):
+            tab = tk.Frame(notebook)
+            notebook.add(tab, text=f"Use Case {i}")
+            result_text = scrolledtext.ScrolledText(tab, height=25, width=100)
+            result_text.insert(tk.END, extraction)
+            result_text.pack(pady=10)
+            tk.Button(tab, text="Continue with this Use Case",
+                      command=lambda u=use_case, t=result_text: self.continue_with_use_case(u, t.get("1.0", tk.END).strip())
+                      ).pack(side=tk.RIGHT, padx=20)
+
+        # Buttons
+        tk.Button(self, text="Back", command=self.create_main_interface).pack(side=tk.LEFT, padx=20, pady=20)
+        tk.Button(self, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=20, pady=20)
+
+    def continue_with_use_case(self, use_case, extraction):
+        """Continue the regular step-by-step process for one use case of a batch."""
+        self.use_case = use_case
+        self.client.start_conversation(use_case)
+        self.current_step = 1  # Set current step to Step 1
+        self.create_result_interface(extraction, build_use_case_prompt(use_case), STEP_1_MAX_TOKENS)
+
+    def create_result_interface(self, result, prompt, max_tokens):
+        """Create the result interface to display the generated response, with max_tokens as the completion budget for feedback."""
         self.clear_window()
 
         # Preprocess the result to extract only the SHACL code
-        shacl_code = self.extract_shacl_code(result)
+        shacl_code = extract_shacl_code(result)
 
         # Result Display
         tk.Label(self, text="Output:").pack(pady=10)
@@ -154,35 +738,32 @@ class Application(tk.Tk):
 
         # Buttons
         if self.current_step == 3:
+            # Show whether the SHACL document parses as Turtle
+            self.validation_label = tk.Label(self, text="", wraplength=700)
+            self.validation_label.pack()
+            if shacl_code:
+                self.validate_result(shacl_code)
             # Only show "Not Satisfied" and "Close" buttons for Step 3
-            tk.Button(self, text="Give Feedback", command=lambda: self.ask_for_new_prompt(prompt)).pack(side=tk.LEFT, padx=20, pady=20)
+            tk.Button(self, text="Give Feedback", command=lambda: self.ask_for_new_prompt(prompt, max_tokens)).pack(side=tk.LEFT, padx=20, pady=20)
             tk.Button(self, text="Close", command=self.destroy).pack(side=tk.RIGHT, padx=20, pady=20)
         else:
             # For other steps, show the usual buttons
             tk.Button(self, text="Back", command=self.create_main_interface).pack(side=tk.LEFT, padx=20, pady=20)
             tk.Button(self, text="Next Step", command=lambda: self.process_next_step(prompt)).pack(side=tk.RIGHT, padx=20, pady=20)
-            tk.Button(self, text="Give Feedback", command=lambda: self.ask_for_new_prompt(prompt)).pack(side=tk.RIGHT, padx=20, pady=20)
-
-    def extract_shacl_code(self, text):
-        """Extract the SHACL code block from the AI-generated text."""
-        # Use regex to find the SHACL code block (assuming it's enclosed in ```turtle or ```)
-        shacl_pattern = r"```(?:turtle)?\s*(.*?)```"
-        match = re.search(shacl_pattern, text, re.DOTALL)
-        if match:
-            return match.group(1).strip()  # Return the extracted SHACL code
-        else:
-            # If no code block is found, assume the entire text is SHACL code
-            return text.strip()
+            tk.Button(self, text="Give Feedback", command=lambda: self.ask_for_new_prompt(prompt, max_tokens)).pack(side=tk.RIGHT, padx=20, pady=20)
 
-    def ask_for_new_prompt(self, prompt):
+    def ask_for_new_prompt(self, prompt, max_tokens):
         """Ask the user for a new prompt if they are not satisfied."""
         new_prompt = simpledialog.askstring("New Prompt", "Please provide additional details or clarify your request:")
         if new_prompt:
-            # Append the new prompt to the history
-            self.client.history.append({"role": "user", "content": new_prompt})
-            # Regenerate the response
-            response = self.client.ask(new_prompt)
-            self.create_result_interface(response, new_prompt)
+            # The steps are sent without history, so give the feedback the exchange it refers to
+            context = []
+            if len(self.client.history) < 3 or self.client.history[-2]["content"] != prompt:
+                context = [{"role": "user", "content": prompt},
+                           {"role": "assistant", "content": self.result_text.get("1.0", tk.END).strip()}]
+            # Regenerate the response, keeping the JSON format that steps 1 and 2 are parsed from
+            self.run_async(self.client.ask(new_prompt, json_mode=self.current_step < 3, context=context, max_tokens=max_tokens),
+                           lambda response: self.create_result_interface(response, new_prompt, max_tokens))
 
     def clear_window(self):
         """Clear all widgets from the window."""
@@ -195,179 +776,131 @@ class Application(tk.Tk):
         if not self.use_case:
             messagebox.showwarning("Input Error", "Please enter a use case.")
             return
+        # Feedback only sees earlier exchanges about this use case
+        self.client.start_conversation(self.use_case)
 
         # Step 1: Extract entities
-        prompt_1 = f"""I will provide you with a text describing a use case. I would like you to extract all objects from this text that match Turtle Code from this source: https://schema.org/version/latest/schemaorg-current-https.ttl. 
-        It is important that you always contextually select only the most logical and fitting example from the provided source. The output should only include the noun used in the source, meaning not the name but the overarching concept for names, such as "I" would be "Person", as well as the exact description provided under rdfs:comment of the according selection in the provided source.
-
-Here is an example:
-The Use Case is "I have the company Amazon which has 50 employees. These employees should own BMWs. These cars must in turn be manufactured by company AB."
-
-A correct output for this would be:
-Car (Fits for BMW)
-A car is a wheeled, self-powered motor vehicle used for transportation.
-Organization (Fits for Amazon)
-An organization such as a school, NGO, corporation, club, etc.
-Person (Fits for Employees and I)
-A person (alive, dead, undead, or fictional).
-
-Note, that Car is chosen over Vehicle, as it is the most fitting and accurate. Vehicle would be incorrect, but not accurate enough. Always choose the most accurate example.
-
-Another example might be as such:
-The Use Case is "I have a friend who like to fly with a plane, but it costs about 5.000€ to do so. Luckily, he just found a Joboffer which will pay him handsomely. He can also renovate his house!"
-A correct output for this would be:
-Person  (Fits for I and Friend)
-A person (alive, dead, undead, or fictional).
-Aircraft  (Fits for Plane)
-An aircraft is a vehicle capable of atmospheric flight due to interaction with the air, such as buoyancy or lift.
-JobPosting  (Fits for Joboffer)
-A listing that describes a job opening in a certain organization.
-House  (Fits for House)
-A house is a building or structure that serves as living quarters for one or more families.
-MonetaryAmount  (Fits for 5.000€)
-A monetary value or range. This type can be used to describe an amount of money such as $50 USD.
-
-Make sure your answers are consistent with your findings and name them as such. A Mercedes is a Car, not an Automotive, as Automotive doesnt exist in the provided list, but Car does and is the most fitting match.
-If nouns occur multiple times, e.g., two different companies, do not provide redundant results but only one for "Organization".
-Do not use any bold writing in your answer. Stay with normaly formated text. Your answer should only include the list as provided in the example.
-
-Double check and work cronologically through all mentioned steps before providing your answer. Make once again sure to check if any more fitting descriptions are available, e.g. instead of "Place" for Europe, "Continent" would be more accurate. 
-
-Here is the text to analyze:
+        prompt_1 = build_use_case_prompt(self.use_case)
+        def show_response_1(response_1):
+            self.create_result_interface(response_1, prompt_1, STEP_1_MAX_TOKENS)
+            self.current_step = 1  # Set current step to Step 1
+
+        # Entity extraction should be reproducible, so use temperature 0
+        self.run_async(self.client.ask(prompt_1, temperature=0, json_mode=True, stateless=True, max_tokens=STEP_1_MAX_TOKENS), show_response_1)
+
+    def process_use_cases_batch(self):
+        """Extract the entities of several use cases, separated by '---' lines, with a single request."""
+        self.use_case = self.use_case_text.get("1.0", tk.END).strip()
+        use_cases = [use_case.strip() for use_case in _USE_CASE_SEPARATOR_RE.split(self.use_case) if use_case.strip()]
+        if not use_cases:
+            messagebox.showwarning("Input Error", "Please enter at least one use case.")
+            return
 
-{self.use_case}
-Please double check your information. Is everything included? Is everything reflected appropiately and correctly within your provided answer? Make sure to remove redundancies in your answer. 
-Also make sure that all answeres are also pulled from the provided source: https://schema.org/version/latest/schemaorg-current-https.ttl. Your answer should only contain the list and no further comments of yourself.
-"""
-        response_1 = self.client.ask(prompt_1)
-        self.create_result_interface(response_1, prompt_1)
-        self.current_step = 1  # Set current step to Step 1
+        self.run_async(self.extract_entities_batch(use_cases),
+                       lambda extractions: self.create_batch_result_interface(use_cases, extractions))
+
+    async def extract_entities_batch(self, use_cases):
+        """Ask for the entities of all use cases in one request and return one listing per use case."""
+        # Split larger batches so every request stays within the model's output limit
+        group_size = MAX_OUTPUT_TOKENS // STEP_1_MAX_TOKENS
+        if len(use_cases) > group_size:
+            groups = await asyncio.gather(*(self.extract_entities_batch(use_cases[i:i + group_size])
+                                            for i in range(0, len(use_cases), group_size)))
+            return [listing for group in groups for listing in group]
+        response = await self.client.ask(build_use_cases_prompt(use_cases), temperature=0, json_mode=True, stateless=True,
+                                         max_tokens=STEP_1_MAX_TOKENS * len(use_cases))
+        results = json.loads(response)["results"]
+        if len(results) != len(use_cases):
+            raise Exception(f"Expected extractions for {len(use_cases)} use cases but received {len(results)}")
+        return [format_entities(result["entities"]) for result in results]
+
+    async def extract_properties(self, entities, prompts):
+        """Ask for the properties of all entities concurrently and assemble them into one response."""
+        responses = await asyncio.gather(*(self.client.ask(prompt, temperature=0, json_mode=True, stateless=True, max_tokens=STEP_2_MAX_TOKENS)
+                                         for prompt in prompts))
+        return format_properties(entities, responses)
+
+    async def stream_response(self, prompt, result_text):
+        """Stream the response to a prompt into a text widget and return the complete text."""
+        chunks = []
+        async for chunk in self.client.astream(prompt, stateless=True, max_tokens=STEP_3_MAX_TOKENS):
+            chunks.append(chunk)
+            self.after(0, self._append_text, result_text, chunk)
+        return "".join(chunks)
+
+    def _append_text(self, text_widget, text):
+        """Append text to a widget unless it has been closed in the meantime."""
+        if text_widget.winfo_exists():
+            text_widget.insert(tk.END, text)
+            text_widget.see(tk.END)
 
     def process_next_step(self, prompt):
         """Process the next step based on the current state."""
         if self.current_step == 1:
             # Step 2: Extract properties
             formatted_response_1 = self.result_text.get("1.0", tk.END).strip()
-            entities = re.findall(r'- (\w+):', formatted_response_1)
-            classes_and_properties = {}
-
-            prompt_2 = "Here are my results:\n"
-            for entity in entities:
-                entity_description = formatted_response_1.split(f"- {entity}: ")[1].split('\n')[0].strip()
-                prompt_2 += f"Type: {entity}\n"
-                prompt_2 += f"Description: {entity_description}\n"
-                classes_and_properties[entity] = []
-
-            prompt_2 += "\nPlease take the properties and expected types for each of these entities from the provided Use Case and the list you created in combination with Schema.org, without actually fetching the URLs. Format the output similarly to the Schema.org page for each entity:\n"
-            for entity in entities:
-                prompt_2 += f"- {entity}\n"
-
-            prompt_2 += """
-A Use Case could be "I have the company Amazon which has 50 employees, out of which one is my Friend Peter Müller, aged 27. These employees should own red BMWs." and a List provided by you created from this Use Case could be as follows:
-Car
-A car is a wheeled, self-powered motor vehicle used for transportation.
-Organization
-An organization such as a school, NGO, corporation, club, etc.
-Person
-A person (alive, dead, undead, or fictional).
-
-An example format for a correct answer would be:
-
-Type Person
-Description A person (alive, dead, undead, or fictional).
-Properties
-- familyName: Family name. In the U.S., the last name of a Person. (Expected Type: Text)
-- givenName: Given name. In the U.S., the first name of a Person. (Expected Type: Text)
-- birthDate: Date of birth. . (Expected Type: Date)
-- affiliation: An organization that this person is affiliated with. (Expected Type: Organization)
-- owns: Products owned by the organization or person. (Expected Type: Product)
-
-Type Organization
-An organization such as a school, NGO, corporation, club, etc. Instances of Organization may appear as a value for the following properties.
-Properties
-- employee: Someone working for this organization. (Expected Type: Person)
-- legalName: The official name of the organization, e.g. the registered company name. (Expected Type: Text)
-
-Type Car
-A car is a wheeled, self-powered motor vehicle used for transportation.
-Properties
-- color: The color of the product. (Expected Type: Text)
-- manufacturer: The manufacturer of the product. (Expected Type: Organization)
-
-As you can see, only properties which can be logically concluded from the use case are used. Once again, you have to abstract the description in the use case to the most logical property you can find on the according Schema-site for each individual Type.
-You canot use a property for X, if you didnt find it for X on Schema.org. Do not cross-use different properties if they are not findable for that specific type.
-If no properties or descriptions are provided within the Use Case, you can assume the most basic properties the specific Type could need, e.g. a Name or ID or anything which allows for a unique identification of the type.
-"""
-            response_2 = self.client.ask(prompt_2)
-            self.create_result_interface(response_2, prompt_2)
-            self.current_step = 2  # Set current step to Step 2
+            try:
+                entities = parse_entities(formatted_response_1)
+                # One small prompt per entity, sent concurrently
+                prompts_2 = [build_entity_prompt(self.use_case, entity) for entity in entities]
+                # Feedback on the combined result refers to one compact prompt rather than every entity prompt
+                prompt_2 = build_properties_context_prompt(self.use_case, entities)
+            except (ValueError, KeyError, TypeError) as e:
+                messagebox.showwarning("Input Error", f"The entity list is not valid JSON: {e}")
+                return
+
+            def show_response_2(response_2):
+                # The feedback answer lists the properties of every entity at once
+                self.create_result_interface(response_2, prompt_2, min(STEP_2_MAX_TOKENS * len(entities), MAX_OUTPUT_TOKENS))
+                self.current_step = 2  # Set current step to Step 2
+
+            self.run_async(self.extract_properties(entities, prompts_2), show_response_2)
 
         elif self.current_step == 2:
             # Step 3: Generate SHACL document
             formatted_response_2 = self.result_text.get("1.0", tk.END).strip()
-            entities = re.findall(r'- (\w+):', formatted_response_2)
-            classes_and_properties = {}
-
-            for entity in entities:
-                properties = re.findall(r'- (\w+): (.*?)\n', formatted_response_2)
-                for prop in properties:
-                    classes_and_properties[entity] = [{
-                        "name": prop[0],
-                        "description": prop[1],
-                        "path": prop[0].lower(),
-                        "datatype": "xsd:string",
-                        "minCount": 1,
-                        "maxCount": 1
-                    }]
-
-            prompt_3 = f"""Here are the types and their properties:
-
-{formatted_response_2}
-
-Please generate a SHACL document that meets the following requirements:
-
-- Include all types and their properties as described above.
-- Use all necessary prefix declarations based on the types and properties included in the results. This could include prefixes for Schema.org, SHACL, XSD, and possibly others.
-- The SHACL shapes should combine NodeShapes and PropertyShapes, similar to this example:
-
-```turtle
-ex:ExampleNodeShapeWithPropertyShapes
-    a sh:NodeShape ;
-    sh:targetClass ex:ExampleClass ;
-    sh:property [
-        sh:path ex:email ;
-        sh:name "e-mail" ;
-        sh:description "We need at least one email value" ;
-        sh:datatype xsd:string ;
-        sh:minCount 1 ;
-        sh:maxCount 1 ;
-    ] ;
-    sh:property [
-        sh:path ex:address ;
-        sh:name "Address" ;
-        sh:description "Physical address of the item" ;
-        sh:class ex:PostalAddress ;
-        sh:minCount 1 ;
-        sh:maxCount 1 ;
-    ] .
+            prompt_3 = build_shacl_prompt(formatted_response_2)
+            self.current_step = 3  # Set current step to Step 3
+            self.create_result_interface("", prompt_3, STEP_3_MAX_TOKENS)
+            result_text = self.result_text
 
-Please analyze this SHACL document and make corrections where necessary. Ensure the following:
+            def show_response_3(response_3):
+                # Replace the streamed text with the extracted SHACL code
+                if result_text.winfo_exists():
+                    shacl_code = extract_shacl_code(response_3)
+                    result_text.delete("1.0", tk.END)
+                    result_text.insert(tk.END, shacl_code)
+                    self.validate_result(shacl_code)
 
-- All prefixes are correctly declared and used.
-- The structure and syntax of NodeShapes and PropertyShapes are valid.
-- Datatypes and expected classes align with Schema.org definitions.
-- Add comments or explanations for corrections made.
-
-Provide the corrected SHACL document in Turtle syntax.
-"""
-            response_3 = self.client.ask(prompt_3)
-            self.create_result_interface(response_3, prompt_3)
-            self.current_step = 3  # Set current step to Step 3
+            self.run_async(self.stream_response(prompt_3, result_text), show_response_3)
 
         elif self.current_step == 3:
             # Step 3: Close the program when "Satisfied" is clicked
             self.destroy()  # Directly close the program
 
 if __name__ == "__main__":
-    app = Application()
-    app.mainloop()
+    parser = argparse.ArgumentParser(description="Generate SHACL documents from use case descriptions.")
+    parser.add_argument("--batch", nargs="+", metavar="USE_CASE_FILE",
+                        help="process the given use case files through the OpenAI Batch API without opening the GUI; "
+                             "each SHACL document is written next to its input file with a .ttl extension")
+    args = parser.parse_args()
+
+    if args.batch:
+        use_case_files = [Path(path) for path in args.batch]
+        use_cases = [path.read_text(encoding="utf-8").strip() for path in use_case_files]
+
+        async def run_batch_and_close():
+            async with OpenAIClient(API_KEY) as client:
+                return await run_batch(client, use_cases)
+
+        shacl_docs = asyncio.run(run_batch_and_close())
+        for path, shacl_doc in zip(use_case_files, shacl_docs):
+            if shacl_doc is None:
+                logger.error(f"No SHACL document was generated for {path}")
+                continue
+            output_path = path.with_suffix(".ttl")
+            output_path.write_text(shacl_doc, encoding="utf-8")
+            logger.info(f"Wrote SHACL document for {path} to {output_path}")
+    else:
+        app = Application()
+        app.mainloop()